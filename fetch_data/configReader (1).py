@@ -1,11 +1,40 @@
 import configparser as iniReader
+import os
+
+# Parsed configs keyed by (absolute path, mtime), so re-instantiating a
+# ConfigReader for an unchanged file skips the disk read and parse.
+_CACHE = {}
 
 class ConfigReader:
     def __init__(self, config_file):
-        self.config = iniReader.ConfigParser()
-        self.config.read(config_file)
-    
+        try:
+            mtime = os.path.getmtime(config_file)
+        except OSError:
+            mtime = None
+        key = (os.path.abspath(config_file), mtime)
+        if key not in _CACHE:
+            config = iniReader.ConfigParser()
+            config.read(config_file)
+            _CACHE[key] = config
+        self.config = _CACHE[key]
+        self._conn_str = None
+        self._connect_kwargs = None
+
     def get_db_params(self):
-        db_params = self.config['DatabaseConfig']
-        conn_str = f"dbname='{db_params['dbname']}' user='{db_params['user']}' host='{db_params['host']}' port='{db_params['port']}' password='{db_params['password']}'"
-        return conn_str
\ No newline at end of file
+        if self._conn_str is None:
+            db_params = self.config['DatabaseConfig']
+            self._conn_str = f"dbname='{db_params['dbname']}' user='{db_params['user']}' host='{db_params['host']}' port='{db_params['port']}' password='{db_params['password']}'"
+        return self._conn_str
+
+    def get_db_connect_kwargs(self):
+        # Separate keyword arguments rather than a URL, so credentials need no escaping
+        if self._connect_kwargs is None:
+            db_params = self.config['DatabaseConfig']
+            self._connect_kwargs = {
+                'user': db_params['user'],
+                'password': db_params['password'],
+                'host': db_params['host'],
+                'port': int(db_params['port']),
+                'database': db_params['dbname'],
+            }
+        return dict(self._connect_kwargs)
@@ -2,8 +2,10 @@ import sys
 import os
 import pandas as pd
 import datetime
-import psycopg2
-import psycopg2.extras as psycopg2_e
+import functools
+import asyncio
+import threading
+import asyncpg
 
 parent_dir = os.path.join(os.path.dirname(__file__), '../')
 normalized_path = os.path.normpath(parent_dir)
@@ -11,265 +13,355 @@ normalized_path = os.path.normpath(parent_dir)
 config_dir = os.path.join(normalized_path, 'utils')
 sys.path.append(config_dir)
 
-from configReader import ConfigReader 
+from configReader import ConfigReader
 config_reader = ConfigReader('config.ini')
-conn = psycopg2.connect(config_reader.get_db_params())
-cursor = conn.cursor(cursor_factory=psycopg2_e.RealDictCursor)
 
-def fetchTradingDays():
+# One event loop and one asyncpg pool shared by every fetch in the process.
+# The loop runs on its own daemon thread so callers on any thread can submit
+# queries concurrently; the pool is created lazily on first use since it has
+# to be awaited on that loop.
+_loop = asyncio.new_event_loop()
+threading.Thread(target=_loop.run_forever, name='fetchData-loop', daemon=True).start()
+_pool = None
+_pool_lock = asyncio.Lock()
+
+# Column names for each query, in SELECT order, so DataFrames are built
+# straight from the row tuples.
+COLS_INDEX = ("timestamp", "Open", "High", "Low", "Close")
+COLS_OPTIONS = ("timestamp", "OptionType", "Strike", "Expiry", "Open", "High", "Low", "Close", "Volume")
+COLS_FUTURES = ("timestamp", "Open", "High", "Low", "Close", "Volume")
+
+# Rows pulled per round trip when streaming the large OHLCV selects.
+FETCH_CHUNK_SIZE = 50000
+
+# Upper bound on queries in flight from the fan-out helpers, kept below the
+# pool size so fan-outs cannot starve other callers.
+MAX_CONCURRENT_FETCHES = 10
+_fetch_limit = asyncio.Semaphore(MAX_CONCURRENT_FETCHES)
+
+async def _get_pool():
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await asyncpg.create_pool(**config_reader.get_db_connect_kwargs(), min_size=2, max_size=16)
+    return _pool
+
+# Errors that mean the pooled connection itself is gone (server restart, dropped
+# socket), as opposed to a bad query; only these are worth a retry. The broad
+# InterfaceError is deliberately left out: asyncpg's DataError for bad query
+# arguments derives from it. ConnectionError covers the socket failures (reset,
+# aborted, refused, broken pipe) without the rest of OSError, notably TimeoutError:
+# a slow query must not expire the whole pool and run again.
+_CONNECTION_ERRORS = (
+    asyncpg.exceptions.ConnectionDoesNotExistError,
+    asyncpg.exceptions.PostgresConnectionError,
+    ConnectionError,
+)
+
+async def _execute(op):
     """
-    Function to fetch the Trading Days of SPX market.
+    Run op(conn) on a pooled connection. If the connection turns out to be dead, expire the pool's
+    connections and retry once on a fresh one; any other error propagates unchanged.
+    """
+    pool = await _get_pool()
+    for attempt in (0, 1):
+        try:
+            async with pool.acquire() as conn:
+                return await op(conn)
+        except _CONNECTION_ERRORS:
+            if attempt:
+                raise
+            await pool.expire_connections()
+
+async def _fetch(query_, *params):
+    """
+    Run query_ on a pooled connection and return the asyncpg Records.
+    """
+    return await _execute(lambda conn: conn.fetch(query_, *params))
 
-    Parameters
-    ----------
-    None
+async def _fetch_chunked(query_, columns, *params):
+    """
+    Stream query_ through a server-side cursor in FETCH_CHUNK_SIZE blocks and return one DataFrame.
+    """
+    async def read(conn):
+        chunks = []
+        async with conn.transaction():
+            cur = await conn.cursor(query_, *params)
+            while True:
+                rows = await cur.fetch(FETCH_CHUNK_SIZE)
+                if not rows:
+                    break
+                chunks.append(pd.DataFrame.from_records(rows, columns=columns))
+        return chunks
+
+    chunks = await _execute(read)
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(chunks, ignore_index=True)
+
+def _run(coro):
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
+
+def _to_datetime(value):
+    """
+    Normalise a datetime.date or 'YYYY-MM-DD' string to a midnight datetime.datetime for binding.
+    """
+    if isinstance(value, datetime.date):
+        value = value.strftime('%Y-%m-%d')
+    return datetime.datetime.strptime(value, '%Y-%m-%d')
 
-    Returns
-    -------
-    pd.Dataframe 
+# Postgres type the server reports for the Expiry parameter; probed once per process
+# because Expiry may be stored as a DATE, a TIMESTAMP or a STRING/SYMBOL column.
+_expiry_param_type = None
+
+async def _expiry_param(expiryDate):
     """
-    global ip
-    global conn
-    global cursor
-    query_ = f"""
+    Convert a midnight datetime.datetime expiry into the Python type asyncpg must bind for Expiry = $n.
+    """
+    global _expiry_param_type
+    if _expiry_param_type is None:
+        async def probe(conn):
+            stmt = await conn.prepare("SELECT Expiry FROM spxw_options_ohlcv WHERE Expiry = $1 LIMIT 1")
+            return stmt.get_parameters()[0].name
+        _expiry_param_type = await _execute(probe)
+    if _expiry_param_type in ('text', 'varchar', 'bpchar', 'name'):
+        return expiryDate.strftime('%Y-%m-%d')
+    if _expiry_param_type == 'date':
+        return expiryDate.date()
+    return expiryDate
+
+def _is_valid_table_symbol(symbol):
+    """
+    Futures tables are named {symbol}_futures; the symbol is formatted into the SQL so only plain alphanumerics are allowed.
+    """
+    return isinstance(symbol, str) and symbol.isascii() and symbol.isalnum()
+
+@functools.lru_cache(maxsize=1)
+def _fetchTradingDays(day):
+    # day is only the cache key, so the cached result expires when the date changes
+    query_ = """
                 SELECT DISTINCT DATE_TRUNC('day', Datetime) AS dates
-                FROM spx_index 
+                FROM spx_index
+                ORDER BY dates ASC;
             """
-    try:
-        cursor.execute(query_)
-    except Exception as e:
-        try:
-            cursor.close()
-        except:
-            conn.close()
-            conn = psycopg2.connect(config_reader.get_db_params())
-                    
-        cursor = conn.cursor(cursor_factory=psycopg2_e.RealDictCursor)
-        cursor.execute(query_)
+    rows = _run(_fetch(query_))
 
-    df = pd.DataFrame(cursor.fetchall())
+    df = pd.DataFrame.from_records(rows, columns=['dates'])
     df['dates'] = pd.to_datetime(df['dates']).dt.date
     return df
 
-def fetchExpiryDays(symbol:str):
+def fetchTradingDays():
     """
-    Function to get the Expiry dates of a particular symbol.
-    
+    Function to fetch the Trading Days of SPX market.
+
     Parameters
     ----------
-    symbol:str - SPXW
+    None
 
     Returns
     -------
-    pd.Dataframe 
+    pd.Dataframe
     """
-    global ip
-    global conn
-    global cursor
-    
+    return _fetchTradingDays(datetime.date.today()).copy()
+
+@functools.lru_cache(maxsize=8)
+def _fetchExpiryDays(symbol):
     if(symbol not in ['SPXW']):
         raise Exception('Invalid symbol')
-    query_ = f"""
+    query_ = """
                 SELECT DISTINCT Expiry
                 FROM spxw_options_ohlcv
                 ORDER BY Expiry ASC;
             """
-    try:
-        cursor.execute(query_)
-    except Exception as e:
-        try:
-            cursor.close()
-        except:
-            conn.close()
-            conn = psycopg2.connect(config_reader.get_db_params())
-                    
-        cursor = conn.cursor(cursor_factory=psycopg2_e.RealDictCursor)
-        cursor.execute(query_)
-
-    df = pd.DataFrame(cursor.fetchall())
-    df['dates'] = pd.to_datetime(df['Expiry'], format='%Y-%m-%d').dt.date
-    df = df.sort_values(by='dates')
-    df = df[['dates']]
-    df = df.reset_index(drop=True)
+    rows = _run(_fetch(query_))
+
+    df = pd.DataFrame.from_records(rows, columns=['dates'])
+    # DATE columns already decode to datetime.date; timestamp-typed expiries need truncating
+    # and string-typed ones parsing
+    if(len(df) > 0 and isinstance(df['dates'].iloc[0], str)):
+        df['dates'] = pd.to_datetime(df['dates'], format='%Y-%m-%d').dt.date
+    elif(len(df) > 0 and isinstance(df['dates'].iloc[0], datetime.datetime)):
+        df['dates'] = pd.DatetimeIndex(df['dates']).date
     return df
 
+def fetchExpiryDays(symbol:str):
+    """
+    Function to get the Expiry dates of a particular symbol.
+
+    Parameters
+    ----------
+    symbol:str - SPXW
+
+    Returns
+    -------
+    pd.Dataframe
+    """
+    return _fetchExpiryDays(symbol).copy()
+
 def fetchDataIndex(symbol:str,startDate:datetime.date,endDate:datetime.date):
     """
     Get the Spot data for the symbol requested.
-    
+
     Parameters
     ----------
     symbol:str - SPX
-    startDate:datetime.date       
+    startDate:datetime.date
     endDate:datetime.date
 
     Returns
     -------
-    pd.Dataframe 
+    pd.Dataframe
     """
-    global ip
-    global conn
-    global cursor
-    
     if(symbol not in ['SPX']):
         raise Exception('Invalid symbol')
-        
-    if isinstance(startDate, datetime.date):
-        startDate = startDate.strftime('%Y-%m-%d')
-    
-    if isinstance(endDate, datetime.date):
-        endDate = endDate.strftime('%Y-%m-%d')
-        
-    endDate = datetime.datetime.strptime(endDate, '%Y-%m-%d')
-    endDate = endDate + datetime.timedelta(days=1)
-    endDate = endDate.strftime('%Y-%m-%d')
-    
+
+    startDate = _to_datetime(startDate)
+    endDate = _to_datetime(endDate) + datetime.timedelta(days=1)
+
     query_ = f"""
-            SELECT Datetime as timestamp, Open, High, Low, Close from {symbol}_index WHERE Datetime >= '{startDate}' AND Datetime <= '{endDate}' ORDER BY Datetime
+            SELECT Datetime as timestamp, Open, High, Low, Close from {symbol}_index WHERE Datetime >= $1 AND Datetime <= $2 ORDER BY Datetime
             """
-    try:
-        cursor.execute(query_)
-    except Exception as e:
-        try:
-            cursor.close()
-        except:
-            conn.close()
-            conn = psycopg2.connect(config_reader.get_db_params())
-                    
-        cursor = conn.cursor(cursor_factory=psycopg2_e.RealDictCursor)
-        cursor.execute(query_)
+    rows = _run(_fetch(query_, startDate, endDate))
 
-    df = pd.DataFrame(cursor.fetchall())
+    df = pd.DataFrame.from_records(rows, columns=COLS_INDEX)
     if(df.empty or len(df) == 0):
-        raise Exception(f"Index data not found - {startDate}__{endDate}__{symbol}")
-    
-    df = df.set_index("timestamp")
-    df.index = pd.to_datetime(df.index, format="%Y-%m-%d %H:%M:%S")
+        raise Exception(f"Index data not found - {startDate:%Y-%m-%d}__{endDate:%Y-%m-%d}__{symbol}")
+
+    df = df.set_index(pd.DatetimeIndex(df.pop('timestamp')))
+    return df
+
+async def _fetchDataOptions(symbol,startDate,endDate,strike,expiryDate,callPut):
+    print('Fetching Option Data for:', symbol , 'from:', startDate, 'to:', endDate, 'for expiry:', expiryDate)
+    if(symbol not in ['SPXW']):
+        raise Exception('Invalid symbol')
+
+    startDate = _to_datetime(startDate)
+    endDate = _to_datetime(endDate) + datetime.timedelta(days=1)
+    expiryDate = _to_datetime(expiryDate)
+
+    query_ = """
+            with
+            meta_query  as (select  date_trunc('second', Datetime) as timestamp,OptionType,Strike,Expiry,Open,High,Low,Close,Volume,Datetime from 'spxw_options_ohlcv' where Datetime > $1 and Datetime < $2 and hour(Datetime)*60 + minute(Datetime) between 570 and 959)
+            SELECT min(timestamp) as timestamp, OptionType,Strike,Expiry,first(Open) as Open, max(High) as High, min(Low) as Low, last(Close) as Close, sum(Volume) as Volume from meta_query where timestamp IN '2000-01-01T09:15;404m;1d;10000' and  (Strike = $3) and (Expiry = $4) and (OptionType=$5) SAMPLE BY 1m;
+            """
+    # $n binding is strictly typed, unlike the quoted literals this replaced
+    df = await _fetch_chunked(query_, COLS_OPTIONS, startDate, endDate, strike, await _expiry_param(expiryDate), str(callPut))
+    if(df.empty or len(df) == 0):
+        raise Exception(f"\nOptions data Not found - {startDate:%Y-%m-%d}__{endDate:%Y-%m-%d}__{strike}__{expiryDate:%Y-%m-%d}__{callPut}")
+    else:
+        df = df.set_index(pd.DatetimeIndex(df.pop('timestamp')))
     return df
 
 def fetchDataOptions(symbol:str,startDate:datetime.date,endDate:datetime.date,strike,expiryDate,callPut):
     """
     Get the Options data for the symbol, strike, expiry,callPut requested.
-    
+
     Parameters
     ----------
     symbol:str - SPXW
-    startDate :datetime.date       
-    endDate: datetime.date    
+    startDate :datetime.date
+    endDate: datetime.date
     strike:
     expiryDate: datetime.date
     callPut: CE or PE
 
     Returns
     -------
-    pd.Dataframe 
+    pd.Dataframe
     """
-    global ip
-    global conn
-    global cursor
-    print('Fetching Option Data for:', symbol , 'from:', startDate, 'to:', endDate, 'for expiry:', expiryDate)
-    if(symbol not in ['SPXW']):
-        raise Exception('Invalid symbol')
+    return _run(_fetchDataOptions(symbol, startDate, endDate, strike, expiryDate, callPut))
+
+async def _fetchDataOptionsMany(symbol, startDate, endDate, strikes, expiries, callPuts):
+    if not (len(strikes) == len(expiries) == len(callPuts)):
+        raise Exception('strikes, expiries and callPuts must have the same length')
+
+    async def fetch_one(strike, expiryDate, callPut):
+        async with _fetch_limit:
+            return await _fetchDataOptions(symbol, startDate, endDate, strike, expiryDate, callPut)
+
+    contracts = list(zip(strikes, expiries, callPuts))
+    if(len(contracts) == 0):
+        return pd.DataFrame(columns=COLS_OPTIONS[1:], index=pd.DatetimeIndex([], name='timestamp'))
+
+    # Let every fetch finish so no task is left running with an unretrieved error,
+    # then report all the contracts that failed at once
+    results = await asyncio.gather(*(fetch_one(*contract) for contract in contracts), return_exceptions=True)
+    failures = [(contract, result) for contract, result in zip(contracts, results) if isinstance(result, BaseException)]
+    if failures:
+        details = '\n'.join(f"{strike}__{expiryDate}__{callPut}: {str(error).strip()}" for (strike, expiryDate, callPut), error in failures)
+        raise Exception(f"Options data fetch failed for {len(failures)} of {len(contracts)} contracts:\n{details}") from failures[0][1]
+    return pd.concat(results)
+
+async def fetchDataOptionsManyAsync(symbol:str,startDate:datetime.date,endDate:datetime.date,strikes,expiries,callPuts):
+    """
+    Awaitable version of fetchDataOptionsMany, usable from any event loop.
 
-    if isinstance(startDate, datetime.date):
-        startDate = startDate.strftime('%Y-%m-%d')
-    if isinstance(endDate, datetime.date):
-        endDate = endDate.strftime('%Y-%m-%d')
-    if isinstance(expiryDate, datetime.date):
-        expiryDate = expiryDate.strftime('%Y-%m-%d')
+    Parameters
+    ----------
+    Same as fetchDataOptionsMany
 
-    endDate = datetime.datetime.strptime(endDate, '%Y-%m-%d')
-    endDate = endDate + datetime.timedelta(days=1)
-    endDate = endDate.strftime('%Y-%m-%d')
+    Returns
+    -------
+    pd.Dataframe
+    """
+    future = asyncio.run_coroutine_threadsafe(_fetchDataOptionsMany(symbol, startDate, endDate, strikes, expiries, callPuts), _loop)
+    return await asyncio.wrap_future(future)
 
-    query_ = f"""
-            with 
-            meta_query  as (select  Datetime as timestamp,OptionType,Strike,Expiry,Open,High,Low,Close,Volume,Datetime from 'spxw_options_ohlcv' where Datetime > '{startDate}' and Datetime < '{endDate}')
-            SELECT min(timestamp) as timestamp, OptionType,Strike,Expiry,first(Open) as Open, max(High) as High, min(Low) as Low, last(Close) as Close, sum(Volume) as Volume from meta_query where timestamp IN '2000-01-01T09:15;404m;1d;10000' and  (Strike = {strike}) and (Expiry = '{expiryDate}') and (OptionType='{callPut}') SAMPLE BY 1m; 
-            """
-    try:
-        cursor.execute(query_)
-    except Exception as e:
-        try:
-            cursor.close()
-        except:
-            conn.close()
-            conn = psycopg2.connect(config_reader.get_db_params())
-                    
-        cursor = conn.cursor(cursor_factory=psycopg2_e.RealDictCursor)
-        cursor.execute(query_)
+def fetchDataOptionsMany(symbol:str,startDate:datetime.date,endDate:datetime.date,strikes,expiries,callPuts):
+    """
+    Get the Options data for several strike/expiry/callPut combinations at once.
+    The fetches run concurrently (at most MAX_CONCURRENT_FETCHES in flight) instead of one round trip after another.
 
-    df = pd.DataFrame(cursor.fetchall())
-    if(df.empty or len(df) == 0):
-        raise Exception(f"\nOptions data Not found - {startDate}__{endDate}__{strike}__{expiryDate}__{callPut}")
-    else:
-        df.timestamp = pd.to_datetime(df.timestamp, format="%Y-%m-%d %H:%M:%S")
-        df = df.set_index("timestamp")
-        df = df.between_time('09:30', '15:59')
-        df.index = df.index.round('s')
-    return df
+    Parameters
+    ----------
+    symbol:str - SPXW
+    startDate :datetime.date
+    endDate: datetime.date
+    strikes: list of strikes
+    expiries: list of datetime.date, one per strike
+    callPuts: list of CE or PE, one per strike
+
+    Returns
+    -------
+    pd.Dataframe - the per-contract frames concatenated, in the order requested (empty if no contracts are given).
+    If any contract fails, one Exception listing every failed contract is raised after all fetches finish.
+    """
+    return _run(_fetchDataOptionsMany(symbol, startDate, endDate, strikes, expiries, callPuts))
+
+@functools.lru_cache(maxsize=8)
+def _fetchContractMonthFutures(symbol):
+    if(not _is_valid_table_symbol(symbol)):
+        raise Exception('Invalid symbol')
 
-def fetchContractMonthFutures(symbol:str):
-    global ip
-    global conn
-    global cursor
-    
     query_ = f"""
              SELECT DISTINCT Contract_month
                 FROM {symbol}_futures
                 ORDER BY Contract_month ASC;
             """
-    try:
-        cursor.execute(query_)
-    except Exception as e:
-        try:
-            cursor.close()
-        except:
-            conn.close()
-            conn = psycopg2.connect(config_reader.get_db_params())
-                    
-        cursor = conn.cursor(cursor_factory=psycopg2_e.RealDictCursor)
-        cursor.execute(query_)
+    rows = _run(_fetch(query_))
 
-    df = pd.DataFrame(cursor.fetchall())
+    df = pd.DataFrame.from_records(rows, columns=['Contract_month'])
     return df
 
+def fetchContractMonthFutures(symbol:str):
+    return _fetchContractMonthFutures(symbol).copy()
+
 def fetchDataFutures(symbol:str,startDate:datetime.date,endDate:datetime.date, contractMonth):
-    global ip
-    global conn
-    global cursor
-  
-    if isinstance(startDate, datetime.date):
-        startDate = startDate.strftime('%Y-%m-%d')
-    
-    if isinstance(endDate, datetime.date):
-        endDate = endDate.strftime('%Y-%m-%d')
-        
-    endDate = datetime.datetime.strptime(endDate, '%Y-%m-%d')
-    endDate = endDate + datetime.timedelta(days=1)
-    endDate = endDate.strftime('%Y-%m-%d')
-    
+    if(not _is_valid_table_symbol(symbol)):
+        raise Exception('Invalid symbol')
+
+    startDate = _to_datetime(startDate)
+    endDate = _to_datetime(endDate) + datetime.timedelta(days=1)
+
     query_ = f"""
-            SELECT Datetime as timestamp, Open, High, Low, Close, Volume from {symbol}_futures WHERE Datetime >= '{startDate}' AND Datetime <= '{endDate}' AND Contract_month='{contractMonth}' ORDER BY Datetime
+            SELECT Datetime as timestamp, Open, High, Low, Close, Volume from {symbol}_futures WHERE Datetime >= $1 AND Datetime <= $2 AND Contract_month=$3 ORDER BY Datetime
             """
-    try:
-        cursor.execute(query_)
-    except Exception as e:
-        try:
-            cursor.close()
-        except:
-            conn.close()
-            conn = psycopg2.connect(config_reader.get_db_params())
-                    
-        cursor = conn.cursor(cursor_factory=psycopg2_e.RealDictCursor)
-        cursor.execute(query_)
-
-    df = pd.DataFrame(cursor.fetchall())
+    # $n binding is strictly typed; the contract month used to be a quoted literal, so accept ints too
+    df = _run(_fetch_chunked(query_, COLS_FUTURES, startDate, endDate, str(contractMonth)))
     if(df.empty or len(df) == 0):
-        raise Exception(f"Futures data not found - {startDate}__{endDate}__{symbol}")
-    
-    df = df.set_index("timestamp")
-    df.index = pd.to_datetime(df.index, format="%Y-%m-%d %H:%M:%S")
+        raise Exception(f"Futures data not found - {startDate:%Y-%m-%d}__{endDate:%Y-%m-%d}__{symbol}")
+
+    df = df.set_index(pd.DatetimeIndex(df.pop('timestamp')))
     return df
 
 if __name__=="__main__":
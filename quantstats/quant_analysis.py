@@ -1,4 +1,6 @@
+import numpy as np
 import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype
 import quantstats.reports as reports
 import os
 import warnings
@@ -6,6 +8,10 @@ from datetime import datetime
 from typing import Dict, Any, Optional, Union
 
 
+# Trade sides as a fixed categorical, so side masks compare integer codes
+POSITION_DTYPE = pd.CategoricalDtype(['long', 'short'])
+
+
 def generate_quantstats_report(
     csv_file: str,
     output_file: str = "Strategy_Report.html",
@@ -36,30 +42,43 @@ def generate_quantstats_report(
         
     Raises:
         FileNotFoundError: If CSV file cannot be found
-        ValueError: If required columns are missing from CSV
+        ValueError: If the CSV is empty, has no trades, is missing required columns, or its timestamps cannot be parsed
     """
     # Suppress warnings
     warnings.filterwarnings("ignore")
     
-    # Read the CSV file with trade data
+    # Read just the header first, so missing columns are reported before parse_dates trips on them
     try:
-        trades_df = pd.read_csv(csv_file)
+        csv_columns = pd.read_csv(csv_file, nrows=0).columns
     except FileNotFoundError:
         raise FileNotFoundError(f"CSV file not found: {csv_file}")
+    except pd.errors.EmptyDataError:
+        raise ValueError(f"CSV file is empty: {csv_file}")
     
     # Check for required columns
     required_columns = ['entry_time', 'exit_time', 'position', 'pnl']
-    missing_columns = [col for col in required_columns if col not in trades_df.columns]
+    missing_columns = [col for col in required_columns if col not in csv_columns]
     if missing_columns:
         raise ValueError(f"Missing required columns in CSV: {', '.join(missing_columns)}")
     
+    # Read the trade data, parsing timestamps and typing columns in the reader
+    trades_df = pd.read_csv(
+        csv_file,
+        parse_dates=['entry_time', 'exit_time'],
+        dtype={'pnl': np.float64, 'position': POSITION_DTYPE, 'drawdown': np.float64},
+        engine='c'
+    )
+    if trades_df.empty:
+        raise ValueError(f"CSV file contains no trades: {csv_file}")
+    
+    # read_csv leaves a timestamp column as object dtype when it cannot parse it
+    unparsed_columns = [col for col in ['entry_time', 'exit_time'] if not is_datetime64_any_dtype(trades_df[col])]
+    if unparsed_columns:
+        raise ValueError(f"Could not parse timestamps in CSV columns: {', '.join(unparsed_columns)}")
+    
     if not quiet:
         print(f"Analyzing {len(trades_df)} trades...")
     
-    # Convert entry and exit times to datetime
-    trades_df['entry_time'] = pd.to_datetime(trades_df['entry_time'])
-    trades_df['exit_time'] = pd.to_datetime(trades_df['exit_time'])
-    
     if not quiet:
         print("\nDate ranges:")
         print(f"Earliest entry: {trades_df['entry_time'].min()}")
@@ -68,18 +87,32 @@ def generate_quantstats_report(
     # Sort trades by exit time
     trades_df = trades_df.sort_values('exit_time')
     
-    # Create equity curve
-    equity = [initial_capital]
-    dates = [trades_df['entry_time'].min().date() - pd.Timedelta(days=1)]  # Start day before first trade
-    
-    # Add each trade's P&L to equity
-    for _, trade in trades_df.iterrows():
-        trade_dollars = trade['pnl'] * point_value
-        equity.append(equity[-1] + trade_dollars)
-        dates.append(trade['exit_time'].date())
-    
-    # Create equity Series
-    equity_series = pd.Series(equity[1:], index=pd.DatetimeIndex(dates[1:]))
+    # Create equity curve: initial capital followed by the running total after each trade
+    pnl = trades_df['pnl'].to_numpy()
+    pnl_dollars = pnl * point_value
+    equity = np.concatenate(([initial_capital], initial_capital + pnl_dollars.cumsum()))
+    exit_days = trades_df['exit_time'].dt.normalize()
+    if exit_days.dt.tz is not None:
+        # Keep the local calendar day; datetime64 conversion would shift it to UTC first
+        exit_days = exit_days.dt.tz_localize(None)
+    dates = exit_days.to_numpy('datetime64[D]')
+    
+    # Create a daily equity Series on a business-day calendar: initial capital on the business day
+    # before the first exit, then each day's closing equity carried forward over days without exits,
+    # so the first return (initial capital to first equity point) falls out of pct_change
+    bdays = pd.bdate_range(
+        pd.Timestamp(dates[0]) - pd.offsets.BDay(1),
+        pd.offsets.BDay().rollforward(pd.Timestamp(dates[-1]))
+    )
+    equity_series = (
+        pd.Series(equity[1:], index=pd.DatetimeIndex(dates))
+        .groupby(level=0).last()
+        .reindex(bdays, method='ffill')
+    )
+    # Only the seed day precedes every exit; after a blank pnl the running total is NaN,
+    # so carry the last known equity forward rather than inventing a value
+    equity_series.iloc[0] = initial_capital
+    equity_series = equity_series.ffill()
     
     if not quiet:
         print("\nEquity series:")
@@ -87,13 +120,9 @@ def generate_quantstats_report(
         print(f"End: {equity[-1]}")
         print(f"Change: {equity[-1] - equity[0]} (${(equity[-1] - equity[0]):,.2f})")
     
-    # Calculate returns from equity
-    rets = equity_series.pct_change().dropna()
-    
-    # Add starting point for first day return (from initial capital to first equity point)
-    first_day_return = (equity_series.iloc[0] - initial_capital) / initial_capital
-    first_day = pd.Series([first_day_return], index=[equity_series.index[0]])
-    rets = pd.concat([first_day, rets])
+    # Calculate returns from equity; float32 is ample for daily returns and halves
+    # the memory traffic through the quantstats pipeline
+    rets = equity_series.pct_change().dropna().astype(np.float32)
     
     if not quiet:
         print("\nReturns check:")
@@ -102,6 +131,10 @@ def generate_quantstats_report(
         print(f"Non-zero returns: {(rets != 0).sum()}")
         print(f"Min return: {rets.min():.6f}, Max return: {rets.max():.6f}")
     
+    # Trade counts, from one pass of boolean reductions over the pnl array
+    wins = pnl > 0
+    total_pnl = np.nansum(pnl)  # skip blank pnl cells, as Series.sum does
+    
     # Create strategy parameters
     strategy_parameters = {
         "strategy_name": f"{strategy_name}",
@@ -111,21 +144,25 @@ def generate_quantstats_report(
         "final_capital": f"${equity[-1]:,.2f}",
         "total_return": f"{(equity[-1] - initial_capital) / initial_capital * 100:.2f}%",
         "point_value": f"${point_value:.2f} per point",
-        "trading_period": f"{dates[1]} to {dates[-1]}",
+        "trading_period": f"{dates[0]} to {dates[-1]}",
         "total_trades": len(trades_df),
-        "win_rate": f"{len(trades_df[trades_df['pnl'] > 0]) / len(trades_df) * 100:.2f}%",
-        "total_pnl": f"{trades_df['pnl'].sum():.2f} points (${trades_df['pnl'].sum() * point_value:.2f})",
+        "win_rate": f"{wins.sum() / len(trades_df) * 100:.2f}%",
+        "total_pnl": f"{total_pnl:.2f} points (${total_pnl * point_value:.2f})",
     }
     
     # Add position breakdown if available
     if 'position' in trades_df.columns:
-        long_trades = len(trades_df[trades_df['position'] == 'long'])
-        short_trades = len(trades_df[trades_df['position'] == 'short'])
+        is_long = (trades_df['position'] == 'long').to_numpy()
+        is_short = (trades_df['position'] == 'short').to_numpy()
+        long_trades = int(is_long.sum())
+        short_trades = int(is_short.sum())
+        long_wins = int((is_long & wins).sum())
+        short_wins = int((is_short & wins).sum())
         strategy_parameters.update({
             "long_trades": long_trades,
             "short_trades": short_trades,
-            "long_win_rate": f"{len(trades_df[(trades_df['position'] == 'long') & (trades_df['pnl'] > 0)]) / max(long_trades, 1) * 100:.2f}%",
-            "short_win_rate": f"{len(trades_df[(trades_df['position'] == 'short') & (trades_df['pnl'] > 0)]) / max(short_trades, 1) * 100:.2f}%"
+            "long_win_rate": f"{long_wins / max(long_trades, 1) * 100:.2f}%",
+            "short_win_rate": f"{short_wins / max(short_trades, 1) * 100:.2f}%"
         })
     
     # Add duration if available